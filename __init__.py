@@ -12,87 +12,40 @@ Description:
 """
 
 from __future__ import print_function
-import sys
 import os
+import hashlib
 import threading
 
 
 # 版本号
 __version__ = "3.1.2"
 
-# 获取插件目录
+# 获取插件目录（包内模块均使用相对导入，无需加入 sys.path）
 PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# 添加插件目录到路径
-if PLUGIN_DIR not in sys.path:
-    sys.path.insert(0, PLUGIN_DIR)
 
+# 依赖列表：(模块名, pip 安装名)，不可变元组，只在加载时构建一次
+REQUIRED_PACKAGES = (
+    ("requests", "requests"),
+    ("PyQt5", "PyQt5"),
+    ("litellm", "litellm"),
+    ("json_repair", "json-repair"),
+    ("markdown", "markdown"),
+)
 
-DEPENDENCE_OK_FILE = os.path.join(PLUGIN_DIR, "dependence_ok")
+# 标记文件名包含依赖列表的哈希，依赖变更后会自动重新检查
+DEPENDENCE_OK_FILE = os.path.join(
+    PLUGIN_DIR,
+    "dependence_ok_"
+    + hashlib.md5(repr(REQUIRED_PACKAGES).encode("utf-8")).hexdigest()[:12],
+)
 
 
 def check_and_install_dependencies():
-    """检查并安装依赖，安装成功后在插件目录创建dependence_ok标记文件"""
-    if os.path.exists(DEPENDENCE_OK_FILE):
-        print("[PyMOL AI Assistant] 依赖已安装，跳过检查")
-        return
+    """检查并安装依赖（实现位于 _bootstrap 模块，标记文件由其加锁复查）"""
+    from ._bootstrap import ensure
 
-    import subprocess
-
-    python_executable = sys.executable
-
-    required_packages = {
-        "requests": "requests",
-        "PyQt5": "PyQt5",
-        "litellm": "litellm",
-        "json_repair": "json-repair",
-        "markdown": "markdown",
-    }
-
-    missing_packages = []
-    for package_name, install_name in required_packages.items():
-        try:
-            __import__(package_name)
-        except ImportError:
-            missing_packages.append(install_name)
-
-    if missing_packages:
-        print(
-            "[PyMOL AI Assistant] 正在安装依赖: {}".format(", ".join(missing_packages))
-        )
-        for attempt in range(1, 3):
-            try:
-                subprocess.check_call(
-                    [
-                        python_executable,
-                        "-m",
-                        "pip",
-                        "install",
-                        "-i",
-                        "http://mirrors.tuna.tsinghua.edu.cn/pypi/web/simple",
-                        "--trusted-host",
-                        "mirrors.tuna.tsinghua.edu.cn",
-                        "--user",
-                        "--quiet",
-                    ]
-                    + missing_packages
-                )
-                print("[PyMOL AI Assistant] 依赖安装成功！")
-                with open(DEPENDENCE_OK_FILE, "w"):
-                    pass
-                return
-            except Exception as e:
-                print(
-                    "[PyMOL AI Assistant] 依赖安装失败 (第{}次): {}".format(attempt, e)
-                )
-        print(
-            "[PyMOL AI Assistant] 依赖安装两次均失败，请手动安装: pip install {}".format(
-                " ".join(missing_packages)
-            )
-        )
-    else:
-        with open(DEPENDENCE_OK_FILE, "w"):
-            pass
+    ensure()
 
 
 # 全局变量存储更新信息
@@ -107,11 +60,15 @@ _update_info = {
 
 def check_update():
     """检查更新"""
-    import threading
-    import requests
 
     def _do_check():
         global _update_info
+        # 在后台线程中导入 requests，避免阻塞 PyMOL 启动
+        try:
+            import requests
+        except ImportError:
+            print("[PyMOL AI Assistant] 检查更新失败: 未安装 requests")
+            return
         try:
             headers = {
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
@@ -165,11 +122,12 @@ def get_update_info():
         return dict(_update_info)
 
 
-# 在后台检查依赖（不阻塞启动）
-import threading as _threading
-
-_dep_thread = _threading.Thread(target=check_and_install_dependencies, daemon=True)
-_dep_thread.start()
+# 依赖已就绪时直接跳过；否则在后台检查依赖（不阻塞启动）
+if os.path.exists(DEPENDENCE_OK_FILE):
+    print("[PyMOL AI Assistant] 依赖已安装，跳过检查")
+else:
+    _dep_thread = threading.Thread(target=check_and_install_dependencies, daemon=True)
+    _dep_thread.start()
 
 # 检查更新（后台线程）
 check_update()
@@ -182,21 +140,21 @@ def show_dialog():
     """显示AI助手对话框"""
     global _dialog_instance
 
-    from pymol.Qt import QtWidgets
-    from . import i18n
-    from . import config
-    from . import logger
-    from . import ai_client
-    from . import tools
-    from . import markdown_renderer
-    from . import updater
+    # 如果对话框已存在，则直接显示它，无需再查找父窗口
+    if _dialog_instance is not None:
+        try:
+            _dialog_instance.show()
+            _dialog_instance.raise_()
+            _dialog_instance.activateWindow()
+            return
+        except RuntimeError:
+            # 底层C++对象已被销毁
+            _dialog_instance = None
+
     from .main import AIAssistantDialog
 
-    # 获取PyMOL主窗口作为父窗口
-    app = QtWidgets.QApplication.instance()
+    # 尝试获取PyMOL主窗口作为父窗口
     parent = None
-
-    # 尝试获取PyMOL主窗口
     try:
         from pymol import cmd
 
@@ -204,22 +162,28 @@ def show_dialog():
     except Exception:
         pass
 
-    # 如果对话框已存在，则显示它
-    if _dialog_instance is not None:
-        try:
-            _dialog_instance.show()
-            _dialog_instance.raise_()
-            _dialog_instance.activateWindow()
-            return
-        except RuntimeError:
-            _dialog_instance = None
-
-    # 创建新对话框
+    # 创建新对话框；关闭时只隐藏（QDialog 默认行为），再次打开时复用同一实例
     _dialog_instance = AIAssistantDialog(parent)
+    _dialog_instance.destroyed.connect(_on_dialog_destroyed)
 
     _dialog_instance.show()
 
 
+def _on_dialog_destroyed(*args):
+    """底层C++对象被Qt销毁（如PyMOL退出）时清除全局引用"""
+    global _dialog_instance
+    _dialog_instance = None
+
+
+def __getattr__(name):
+    """延迟导入GUI模块，只有真正访问时才加载 main（PEP 562）"""
+    if name == "AIAssistantDialog":
+        from .main import AIAssistantDialog
+
+        return AIAssistantDialog
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
 def __init_plugin__(app=None):
     """初始化插件 - PyMOL会调用这个函数"""
     from pymol.plugins import addmenuitemqt
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+依赖检查与安装模块 - 只在首次启动或依赖变更时才会被用到
+"""
+
+import os
+import sys
+import threading
+
+from . import REQUIRED_PACKAGES, DEPENDENCE_OK_FILE
+
+# pip 安装参数（缺失的包会追加在后面，一次性安装）
+PIP_INSTALL_ARGS = [
+    "-m",
+    "pip",
+    "install",
+    "-i",
+    "http://mirrors.tuna.tsinghua.edu.cn/pypi/web/simple",
+    "--trusted-host",
+    "mirrors.tuna.tsinghua.edu.cn",
+    "--user",
+    "--quiet",
+    "--disable-pip-version-check",
+    "--no-input",
+    "--prefer-binary",
+]
+
+# 跨进程安装锁：多个PyMOL同时首次启动时只有一个进程执行pip
+INSTALL_LOCK_FILE = os.path.join(os.path.dirname(DEPENDENCE_OK_FILE), ".install.lock")
+# 超过该时间（秒）的锁文件视为上次安装异常退出遗留
+INSTALL_LOCK_STALE = 600
+
+_lock = threading.Lock()
+_done = False
+
+
+def _refresh_user_site():
+    """只刷新用户 site-packages 的查找器缓存，让刚安装的包可以被导入"""
+    import site
+
+    user_site = site.getusersitepackages()
+    # 首次 --user 安装前该目录可能不存在，启动时不会被加入 sys.path
+    if user_site not in sys.path:
+        sys.path.append(user_site)
+    sys.path_importer_cache.pop(user_site, None)
+
+
+def _mark_ok():
+    with open(DEPENDENCE_OK_FILE, "w"):
+        pass
+    # 清理旧版 dependence_ok 及之前依赖列表哈希对应的标记文件
+    import glob
+
+    marker_dir = os.path.dirname(DEPENDENCE_OK_FILE)
+    for path in glob.glob(os.path.join(marker_dir, "dependence_ok*")):
+        if path != DEPENDENCE_OK_FILE:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _acquire_install_lock():
+    """获取跨进程安装锁，其他进程正在安装时等待其结束
+
+    返回 True 表示已持有锁；返回 False 表示等待期间另一进程已完成安装。
+    """
+    import time
+
+    while True:
+        try:
+            fd = os.open(INSTALL_LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            return True
+        except FileExistsError:
+            pass
+        except OSError:
+            # 插件目录不可写时不加锁，直接安装
+            return True
+
+        if os.path.exists(DEPENDENCE_OK_FILE):
+            return False
+        try:
+            if time.time() - os.path.getmtime(INSTALL_LOCK_FILE) > INSTALL_LOCK_STALE:
+                os.remove(INSTALL_LOCK_FILE)
+                continue
+        except OSError:
+            continue
+        time.sleep(1)
+
+
+def _release_install_lock():
+    try:
+        os.remove(INSTALL_LOCK_FILE)
+    except OSError:
+        pass
+
+
+def find_missing(required=REQUIRED_PACKAGES):
+    """返回缺失依赖的 pip 安装名列表"""
+    import importlib.util
+
+    # 已导入的模块直接跳过；其余只查找模块规格，不执行模块代码（避免加载 PyQt5/litellm 等重量级模块）
+    missing_packages = []
+    for package_name, install_name in required:
+        if package_name in sys.modules:
+            continue
+        if importlib.util.find_spec(package_name) is None:
+            missing_packages.append(install_name)
+    return missing_packages
+
+
+def _install(missing_packages):
+    """安装缺失的依赖，最多尝试两次"""
+    import subprocess
+
+    print("[PyMOL AI Assistant] 正在安装依赖: {}".format(", ".join(missing_packages)))
+    for attempt in range(1, 3):
+        try:
+            args = [sys.executable] + PIP_INSTALL_ARGS + missing_packages
+            # 逐行转发 pip 输出到 PyMOL 控制台，不在内存中缓存完整日志
+            proc = subprocess.Popen(
+                args,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+            )
+            try:
+                for line in proc.stdout:
+                    line = line.rstrip()
+                    if line:
+                        print("[PyMOL AI Assistant] pip: {}".format(line))
+            except BaseException:
+                # 读取输出时出错也要结束 pip，避免重试时同时运行两个 pip
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+                raise
+            returncode = proc.wait()
+            if returncode:
+                raise subprocess.CalledProcessError(returncode, args)
+            print("[PyMOL AI Assistant] 依赖安装成功！")
+            _refresh_user_site()
+            return True
+        except Exception as e:
+            print("[PyMOL AI Assistant] 依赖安装失败 (第{}次): {}".format(attempt, e))
+    print(
+        "[PyMOL AI Assistant] 依赖安装两次均失败，请手动安装: pip install {}".format(
+            " ".join(missing_packages)
+        )
+    )
+    return False
+
+
+def ensure(required=REQUIRED_PACKAGES):
+    """检查并安装依赖，安装成功后在插件目录创建dependence_ok标记文件
+
+    同一进程内只执行一次，重复调用直接返回。
+    """
+    global _done
+    with _lock:
+        if _done:
+            return
+        _done = True
+
+        if os.path.exists(DEPENDENCE_OK_FILE):
+            print("[PyMOL AI Assistant] 依赖已安装，跳过检查")
+            return
+
+        missing_packages = find_missing(required)
+        if not missing_packages:
+            _mark_ok()
+            return
+
+        # 所有缺失的包合并为一次pip调用，并由安装锁保证同一时间只有一个进程安装
+        if not _acquire_install_lock():
+            print("[PyMOL AI Assistant] 依赖已由另一个PyMOL进程安装完成")
+            _refresh_user_site()
+            return
+        try:
+            if _install(missing_packages):
+                _mark_ok()
+        finally:
+            _release_install_lock()
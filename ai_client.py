@@ -9,30 +9,57 @@ import hashlib
 import json
 import secrets
 import string
+import threading
 from typing import Any
 
 import json_repair
 from . import config, tools, logger
 
+# orjson 为可选依赖，安装后用于加速工具参数/结果的序列化
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 _litellm = None
 _completion = None
 _litellm_initialized = False
+_litellm_lock = threading.Lock()
 
 
 def _ensure_litellm():
     global _litellm, _completion, _litellm_initialized
     if _litellm_initialized:
         return
-    import litellm as _ll
+    with _litellm_lock:
+        if _litellm_initialized:
+            return
+        import litellm as _ll
+
+        _litellm = _ll
+        _completion = _ll.completion
+        _ll.drop_params = True
+        _ll.suppress_debug_info = True
+        _ll.set_verbose = False
+        _ll.cost_per_token = {}
+        _ll.telemetry = False
+        _litellm_initialized = True
+
+
+def prewarm():
+    """在后台线程中预先导入 LiteLLM，避免首条消息等待导入"""
+    if _litellm_initialized:
+        return
+
+    def _run():
+        try:
+            _ensure_litellm()
+        except Exception as e:
+            logger.logger.warning(
+                logger.SYSTEM, "预加载 LiteLLM 失败", {"error": str(e)}
+            )
 
-    _litellm = _ll
-    _completion = _ll.completion
-    _ll.drop_params = True
-    _ll.suppress_debug_info = True
-    _ll.set_verbose = False
-    _ll.cost_per_token = {}
-    _ll.telemetry = False
-    _litellm_initialized = True
+    threading.Thread(target=_run, daemon=True).start()
 
 
 _ALNUM = string.ascii_letters + string.digits
@@ -52,75 +79,90 @@ def _normalize_tool_call_id(tool_call_id: Any) -> Any:
     return hashlib.sha1(tool_call_id.encode()).hexdigest()[:9]
 
 
-class AIClient:
-    """AI客户端 - 基于LiteLLM，流式输出 + 非流式工具调用"""
-
-    def __init__(self):
-        self.provider = None
-        self.api_url = None
-        self.api_key = None
-        self.model = None
-        self.api_version = None
-        self.is_reasoning_model = False
-        self.is_vision_model = False
-        self.temperature = 0.7
-        self.max_tokens = 8000
-        self.timeout = 60
-        self.max_iterations = 40
-
-    def set_config(self, api_config):
-        """设置API配置"""
-        self.provider = api_config.get("provider", "custom")
-        self.api_url = api_config.get("api_url", "")
-        self.api_key = api_config.get("api_key", "")
-        self.model = api_config.get("model", "")
-        self.api_version = api_config.get("api_version", "")
-        self.is_reasoning_model = api_config.get("is_reasoning_model", False)
-        self.is_vision_model = api_config.get("is_vision_model", False)
-        self.temperature = api_config.get("temperature", 0.7)
-        self.max_tokens = api_config.get("max_tokens", 8000)
-        self.timeout = api_config.get("timeout", 60)
-
-    def _get_model_name(self):
-        """获取LiteLLM格式的模型名称"""
-        if not self.model:
-            return None
-
-        provider_info = config.get_provider_info(self.provider)
-        prefix = provider_info.get("prefix", "openai/")
-
-        if self.model.startswith(prefix):
-            return self.model
-
-        known_prefixes = [
-            "openai/",
-            "azure/",
-            "anthropic/",
-            "gemini/",
-            "ollama/",
-            "zhipu/",
-            "openrouter/",
-            "together_ai/",
-            "huggingface/",
-            "bedrock/",
-            "vertex_ai/",
-            "groq/",
-        ]
-        for known_prefix in known_prefixes:
-            if self.model.startswith(known_prefix):
-                return self.model
+def _loads(text: str) -> Any:
+    """解析 JSON 文本（优先使用 orjson）"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
 
-        return f"{prefix}{self.model}"
 
-    def _get_system_prompt(self):
-        """
-        获取系统提示词
+def _dumps(obj: Any) -> str:
+    """序列化为 JSON 文本，保留非 ASCII 字符（优先使用 orjson）"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            # orjson 不支持的类型（如超大整数）交给标准库处理
+            pass
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def _parse_tool_arguments(text: str) -> Any:
+    """解析工具参数：合法 JSON 直接用标准库解析，失败时才交给 json_repair 修复"""
+    try:
+        return _loads(text)
+    except ValueError:
+        return json_repair.loads(text)
+
+
+def _close_stream(response) -> None:
+    """提前结束流式响应时关闭底层连接，不再继续接收剩余片段"""
+    for stream in (response, getattr(response, "completion_stream", None)):
+        close = getattr(stream, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+
+def _tool_call_entry(tool_call: dict, arguments_str: str) -> dict:
+    """构建助手消息中 tool_calls 的单个条目"""
+    return {
+        "id": tool_call["id"],
+        "type": "function",
+        "function": {"name": tool_call["name"], "arguments": arguments_str},
+    }
+
+
+def _tool_response_content(tool_name: str, result: dict) -> str:
+    """将工具执行结果转换为 tool 消息的文本内容"""
+    if (
+        tool_name == "pymol_capture_view"
+        and result.get("success")
+        and result.get("image_data")
+    ):
+        image_base64 = result.get("image_data")
+        return _dumps(
+            {
+                "message": result.get("message"),
+                "has_image": True,
+                "image_url": f"data:image/png;base64,{image_base64}",
+                "width": result.get("width"),
+                "height": result.get("height"),
+            }
+        )
 
-        美化与渲染风格参考来源：
-        - https://zhuanlan.zhihu.com/p/530533107 (PyMOL绘图进阶)
-        - https://pymolwiki.org/index.php/Gallery (PyMOL Wiki Gallery)
-        """
-        base_prompt = """你是一个PyMOL分子可视化助手。你可以使用提供的工具来控制PyMOL软件。
+    content = result.get("message", "")
+    extra_parts = []
+    if result.get("output"):
+        extra_parts.append(result["output"])
+    if result.get("data"):
+        extra_parts.append(_dumps(result["data"]))
+    if result.get("errors"):
+        extra_parts.append("错误: " + "; ".join(result["errors"]))
+    if result.get("error"):
+        extra_parts.append(result["error"])
+    if extra_parts:
+        extra = "\n".join(extra_parts)
+        return content + "\n" + extra if content else extra
+    if not content:
+        return _dumps(result)
+    return content
+
+
+# 系统提示词片段：视觉模型额外包含截图工具说明
+_SYSTEM_PROMPT_TOOLS = """你是一个PyMOL分子可视化助手。你可以使用提供的工具来控制PyMOL软件。
 
 【重要原则】
 - 请使用与用户相同的语言进行回答（用户用中文就用中文，用户用英文就用英文）- 这是最重要的规则，必须严格遵守
@@ -160,11 +202,10 @@ class AIClient:
 - pymol_center: 将视图中心移动到指定选择
 - pymol_reset: 重置视图到默认状态"""
 
-        if self.is_vision_model:
-            base_prompt += """
+_SYSTEM_PROMPT_VISION_TOOL = """
 - pymol_capture_view: 捕获当前PyMOL视图的截图，让你能够看到实际的画面效果"""
 
-        base_prompt += """
+_SYSTEM_PROMPT_GUIDE = """
 其他操作：
 - pymol_select: 创建命名的选择集（支持 chain A, resi 1-100, name CA, resn ASP, elem C 等表达式）
 - pymol_set: 设置 PyMOL 参数（如 ray_shadows, cartoon_cylindrical_helices, bg_gradient, transparency 等）
@@ -253,11 +294,102 @@ class AIClient:
 5. 如果用户询问关于分子结构的问题但没有明确提供PDB ID或文件路径，默认假设结构已经加载到PyMOL中，直接使用pymol_get_info等工具查询当前加载的结构，而不是尝试加载新结构
 6. 选择表达式语法示例：chain A, resi 1-100, name CA, resn ASP, elem C, chain A and resi 50, /1abc//A/50/CA"""
 
-        if self.is_vision_model:
-            base_prompt += """
+_SYSTEM_PROMPT_VISION_TIP = """
 7. 如果需要查看当前渲染效果，可以使用 pymol_capture_view 工具捕获截图，这样可以直观地看到画面的实际效果"""
 
-        return base_prompt
+# 完整系统提示词只在模块加载时拼接一次
+_SYSTEM_PROMPT = _SYSTEM_PROMPT_TOOLS + _SYSTEM_PROMPT_GUIDE
+_SYSTEM_PROMPT_VISION = (
+    _SYSTEM_PROMPT_TOOLS
+    + _SYSTEM_PROMPT_VISION_TOOL
+    + _SYSTEM_PROMPT_GUIDE
+    + _SYSTEM_PROMPT_VISION_TIP
+)
+
+
+class _ToolCallBuffer:
+    """流式响应中单个工具调用的累积缓冲"""
+
+    __slots__ = ("id", "name", "arguments")
+
+    def __init__(self, tool_call_id):
+        self.id = tool_call_id
+        # name/arguments 以片段列表累积，流结束后再拼接
+        self.name = []
+        self.arguments = []
+
+
+class AIClient:
+    """AI客户端 - 基于LiteLLM，流式输出 + 非流式工具调用"""
+
+    def __init__(self):
+        self.provider = None
+        self.api_url = None
+        self.api_key = None
+        self.model = None
+        self.api_version = None
+        self.is_reasoning_model = False
+        self.is_vision_model = False
+        self.temperature = 0.7
+        self.max_tokens = 8000
+        self.timeout = 60
+        self.max_iterations = 40
+
+    def set_config(self, api_config):
+        """设置API配置"""
+        self.provider = api_config.get("provider", "custom")
+        self.api_url = api_config.get("api_url", "")
+        self.api_key = api_config.get("api_key", "")
+        self.model = api_config.get("model", "")
+        self.api_version = api_config.get("api_version", "")
+        self.is_reasoning_model = api_config.get("is_reasoning_model", False)
+        self.is_vision_model = api_config.get("is_vision_model", False)
+        self.temperature = api_config.get("temperature", 0.7)
+        self.max_tokens = api_config.get("max_tokens", 8000)
+        self.timeout = api_config.get("timeout", 60)
+
+    def _get_model_name(self):
+        """获取LiteLLM格式的模型名称"""
+        if not self.model:
+            return None
+
+        provider_info = config.get_provider_info(self.provider)
+        prefix = provider_info.get("prefix", "openai/")
+
+        if self.model.startswith(prefix):
+            return self.model
+
+        known_prefixes = [
+            "openai/",
+            "azure/",
+            "anthropic/",
+            "gemini/",
+            "ollama/",
+            "zhipu/",
+            "openrouter/",
+            "together_ai/",
+            "huggingface/",
+            "bedrock/",
+            "vertex_ai/",
+            "groq/",
+        ]
+        for known_prefix in known_prefixes:
+            if self.model.startswith(known_prefix):
+                return self.model
+
+        return f"{prefix}{self.model}"
+
+    def _get_system_prompt(self):
+        """
+        获取系统提示词（提示词在模块加载时已拼接好，这里只按视觉模式选择）
+
+        美化与渲染风格参考来源：
+        - https://zhuanlan.zhihu.com/p/530533107 (PyMOL绘图进阶)
+        - https://pymolwiki.org/index.php/Gallery (PyMOL Wiki Gallery)
+        """
+        if self.is_vision_model:
+            return _SYSTEM_PROMPT_VISION
+        return _SYSTEM_PROMPT
 
     def _sanitize_messages(self, messages: list[dict]) -> list[dict]:
         """清理消息格式，标准化 tool_call_id"""
@@ -374,9 +506,14 @@ class AIClient:
             elif msg.get("role") == "tool" and msg.get("content"):
                 try:
                     content = msg.get("content")
-                    if isinstance(content, str):
+                    # 只有截图结果才是带 has_image 的 JSON 对象，其余工具文本无需尝试解析
+                    if (
+                        isinstance(content, str)
+                        and content.startswith("{")
+                        and '"has_image"' in content
+                    ):
                         try:
-                            tool_result = json.loads(content)
+                            tool_result = _loads(content)
                             if tool_result.get("has_image") and tool_result.get(
                                 "image_url"
                             ):
@@ -432,7 +569,7 @@ class AIClient:
         for tc in raw_tool_calls:
             args = tc.function.arguments
             if isinstance(args, str):
-                args = json_repair.loads(args)
+                args = _parse_tool_arguments(args)
 
             tool_calls.append(
                 {
@@ -452,9 +589,9 @@ class AIClient:
         }
 
     def _build_request_params(
-        self, messages: list[dict], use_tools: bool = True
+        self, messages: list[dict], use_tools: bool = True, tool_definitions=None
     ) -> dict:
-        """构建 LiteLLM 请求参数"""
+        """构建 LiteLLM 请求参数（tool_definitions 为空时按当前配置生成）"""
         model_name = self._get_model_name()
 
         request_params = {
@@ -475,21 +612,30 @@ class AIClient:
             request_params["api_version"] = self.api_version
 
         if use_tools:
-            custom_prompts = config.config_manager.get_tool_prompts()
-            request_params["tools"] = tools.get_tool_definitions(self.is_vision_model, custom_prompts)
+            if tool_definitions is None:
+                tool_definitions = self._get_tool_definitions()
+            request_params["tools"] = tool_definitions
             request_params["tool_choice"] = "auto"
 
         return request_params
 
+    def _get_tool_definitions(self):
+        """按当前视觉模式和自定义提示词生成工具定义"""
+        custom_prompts = config.config_manager.get_tool_prompts()
+        return tools.get_tool_definitions(self.is_vision_model, custom_prompts)
+
     def _chat_stream(
         self,
         messages: list[dict],
         use_tools: bool = True,
         on_thinking=None,
         on_content=None,
+        tool_definitions=None,
+        should_stop=None,
     ) -> dict:
         """
         流式聊天请求：content/thinking 实时输出，tool_calls 等流结束后统一解析
+        should_stop 返回 True 时立即停止接收并关闭流，finish_reason 为 "cancelled"
 
         Returns:
             dict: {
@@ -501,7 +647,9 @@ class AIClient:
         """
         _ensure_litellm()
 
-        request_params = self._build_request_params(messages, use_tools)
+        request_params = self._build_request_params(
+            messages, use_tools, tool_definitions
+        )
         request_params["stream"] = True
         request_params["stream_options"] = {"include_usage": True}
 
@@ -517,12 +665,27 @@ class AIClient:
 
         response = _completion(**request_params)
 
-        content_buffer = ""
-        reasoning_buffer = ""
+        # 流式片段收集到列表中，流结束后一次拼接
+        content_parts = []
+        reasoning_parts = []
         tool_calls_map = {}
         finish_reason = "stop"
 
+        # 循环内不变的绑定方法提前取出，避免每个片段重复属性查找
+        add_content = content_parts.append
+        add_reasoning = reasoning_parts.append
+        get_tool_buf = tool_calls_map.get
+
         for chunk in response:
+            if should_stop is not None and should_stop():
+                _close_stream(response)
+                return {
+                    "content": "".join(content_parts),
+                    "tool_calls": [],
+                    "reasoning_content": "".join(reasoning_parts) or None,
+                    "finish_reason": "cancelled",
+                }
+
             if not chunk.choices:
                 continue
 
@@ -533,35 +696,37 @@ class AIClient:
                 continue
 
             if delta.content:
-                content_buffer += delta.content
+                add_content(delta.content)
                 if on_content:
                     on_content(delta.content, False)
 
             reasoning_delta = getattr(delta, "reasoning_content", None)
             if reasoning_delta:
-                reasoning_buffer += reasoning_delta
+                add_reasoning(reasoning_delta)
                 if on_thinking:
                     on_thinking(reasoning_delta, False)
 
             if delta.tool_calls:
                 for tc_delta in delta.tool_calls:
                     idx = getattr(tc_delta, "index", 0) or 0
-                    if idx not in tool_calls_map:
-                        tool_calls_map[idx] = {
-                            "id": getattr(tc_delta, "id", None) or _short_tool_id(),
-                            "name": "",
-                            "arguments": "",
-                        }
+                    buf = get_tool_buf(idx)
+                    if buf is None:
+                        buf = tool_calls_map[idx] = _ToolCallBuffer(
+                            getattr(tc_delta, "id", None) or _short_tool_id()
+                        )
                     func = getattr(tc_delta, "function", None)
                     if func:
                         if getattr(func, "name", None):
-                            tool_calls_map[idx]["name"] += func.name
+                            buf.name.append(func.name)
                         if getattr(func, "arguments", None):
-                            tool_calls_map[idx]["arguments"] += func.arguments
+                            buf.arguments.append(func.arguments)
 
             if choice.finish_reason:
                 finish_reason = choice.finish_reason
 
+        content_buffer = "".join(content_parts)
+        reasoning_buffer = "".join(reasoning_parts)
+
         if content_buffer and on_content:
             on_content("", True)
         if reasoning_buffer and on_thinking:
@@ -569,14 +734,12 @@ class AIClient:
 
         tool_calls = []
         for idx in sorted(tool_calls_map.keys()):
-            tc = tool_calls_map[idx]
-            args = tc["arguments"]
-            if isinstance(args, str):
-                args = json_repair.loads(args)
+            buf = tool_calls_map[idx]
+            args = _parse_tool_arguments("".join(buf.arguments))
             tool_calls.append(
                 {
-                    "id": tc["id"],
-                    "name": tc["name"],
+                    "id": buf.id,
+                    "name": "".join(buf.name),
                     "arguments": args,
                 }
             )
@@ -596,6 +759,7 @@ class AIClient:
         on_tool_call=None,
         on_error=None,
         images=None,
+        should_stop=None,
     ) -> str:
         """
         流式聊天，支持多轮工具调用
@@ -608,6 +772,8 @@ class AIClient:
             on_tool_call: 工具调用回调 (tool_name, params, result)
             on_error: 错误回调 (error_msg)
             images: 图片列表（仅视觉模型支持）
+            should_stop: 可选的无参回调，每收到一个流式分片及执行每个工具前调用一次，
+                返回 True 时中止流式接收和后续工具调用
 
         Returns:
             str: 最终响应内容
@@ -625,9 +791,21 @@ class AIClient:
                 on_error("请输入 API Key")
             return ""
 
-        full_messages = [
-            {"role": "system", "content": self._get_system_prompt()}
-        ] + messages
+        # 系统提示词和工具定义在一次对话的多轮工具调用中保持不变，只生成一次
+        tool_definitions = self._get_tool_definitions()
+
+        if self.is_vision_model:
+
+            def prepare(msgs):
+                return self._process_vision_messages(msgs, images)
+
+        else:
+            prepare = self._sanitize_messages
+
+        # 历史消息只处理一次，之后每轮只处理新追加的消息
+        request_messages = prepare(
+            [{"role": "system", "content": self._get_system_prompt()}] + messages
+        )
 
         iteration = 0
         final_content = ""
@@ -636,18 +814,13 @@ class AIClient:
             iteration += 1
 
             try:
-                if self.is_vision_model:
-                    processed_full_messages = self._process_vision_messages(
-                        full_messages, images
-                    )
-                else:
-                    processed_full_messages = self._sanitize_messages(full_messages)
-
                 response = self._chat_stream(
-                    processed_full_messages,
+                    request_messages,
                     use_tools=True,
                     on_thinking=on_thinking,
                     on_content=on_content,
+                    tool_definitions=tool_definitions,
+                    should_stop=should_stop,
                 )
             except Exception as e:
                 if _litellm is not None:
@@ -670,105 +843,56 @@ class AIClient:
             tool_calls = response["tool_calls"]
             reasoning_content = response["reasoning_content"]
 
+            if response["finish_reason"] == "cancelled":
+                return content
+
             if not tool_calls:
                 final_content = content
                 break
 
-            tool_call_dicts = []
-            for tc in tool_calls:
-                tool_call_dicts.append(
-                    {
-                        "id": tc["id"],
-                        "type": "function",
-                        "function": {
-                            "name": tc["name"],
-                            "arguments": json.dumps(
-                                tc["arguments"], ensure_ascii=False
-                            ),
-                        },
-                    }
-                )
+            # 每个工具调用的参数只序列化一次，历史消息和界面回调共用
+            arguments_strs = [_dumps(tc["arguments"]) for tc in tool_calls]
 
             assistant_msg = {
                 "role": "assistant",
                 "content": content,
-                "tool_calls": tool_call_dicts,
+                "tool_calls": [
+                    _tool_call_entry(tc, arguments_str)
+                    for tc, arguments_str in zip(tool_calls, arguments_strs)
+                ],
             }
             if reasoning_content:
                 assistant_msg["reasoning_content"] = reasoning_content
 
-            full_messages.append(assistant_msg)
+            round_messages = [assistant_msg]
+
+            for tc, arguments_str in zip(tool_calls, arguments_strs):
+                # 用户已停止时不再执行剩余的工具调用
+                if should_stop is not None and should_stop():
+                    return content
 
-            for tc in tool_calls:
                 tool_name = tc["name"]
                 params = tc["arguments"]
-                arguments_str = json.dumps(params, ensure_ascii=False)
 
                 if on_tool_call:
                     on_tool_call(tool_name, arguments_str, None)
 
-                result = tools.tool_executor.execute(tool_name, params)
-
-                logger.logger.info(
-                    logger.TOOL_CALL,
-                    "工具执行: %s" % tool_name,
-                    {"tool": tool_name, "params": params, "result": result},
-                )
+                # 参数、结果和异常堆栈由 ToolExecutor.execute 记录
+                result = tools.tool_executor.execute(tool_name, params, arguments_str)
 
                 if on_tool_call:
                     on_tool_call(tool_name, arguments_str, result)
 
-                tool_response_content = result.get("message", "")
-
-                if (
-                    tool_name == "pymol_capture_view"
-                    and result.get("success")
-                    and result.get("image_data")
-                ):
-                    image_base64 = result.get("image_data")
-                    tool_response_content = json.dumps(
-                        {
-                            "message": result.get("message"),
-                            "has_image": True,
-                            "image_url": f"data:image/png;base64,{image_base64}",
-                            "width": result.get("width"),
-                            "height": result.get("height"),
-                        },
-                        ensure_ascii=False,
-                    )
-                else:
-                    extra_parts = []
-                    if result.get("output"):
-                        extra_parts.append(result["output"])
-                    if result.get("data"):
-                        extra_parts.append(
-                            json.dumps(result["data"], ensure_ascii=False)
-                        )
-                    if result.get("errors"):
-                        extra_parts.append(
-                            "错误: " + "; ".join(result["errors"])
-                        )
-                    if result.get("error"):
-                        extra_parts.append(result["error"])
-                    if extra_parts:
-                        extra = "\n".join(extra_parts)
-                        if tool_response_content:
-                            tool_response_content += "\n" + extra
-                        else:
-                            tool_response_content = extra
-                    elif not tool_response_content:
-                        tool_response_content = json.dumps(
-                            result, ensure_ascii=False
-                        )
-
-                full_messages.append(
+                round_messages.append(
                     {
                         "role": "tool",
                         "tool_call_id": tc["id"],
-                        "content": tool_response_content,
+                        "content": _tool_response_content(tool_name, result),
                     }
                 )
 
+            request_messages.extend(prepare(round_messages))
+
         if iteration >= self.max_iterations and not final_content:
             final_content = (
                 "已达到最大迭代次数 (%d)，任务可能未完成。" % self.max_iterations
@@ -32,6 +32,9 @@ CONFIG_FILE = os.path.join(os.path.expanduser("~"), ".pymol_ai_assistant_config.
 
 DEFAULT_CONFIG = {"current_config": None, "language": "zh", "configs": []}
 
+# 每次请求携带的最近对话消息数（用户与助手消息，滑动窗口）默认值
+DEFAULT_MAX_HISTORY = 40
+
 PROVIDERS = {
     "siliconflow": {
         "name": "SiliconFlow (硅基流动)",
@@ -288,6 +291,7 @@ def create_default_config(name, provider_id="siliconflow"):
         "temperature": 0.7,
         "max_tokens": 8000,
         "timeout": 60,
+        "max_history": DEFAULT_MAX_HISTORY,
     }
 
 
@@ -343,6 +347,8 @@ class ConfigManager:
                 config["max_tokens"] = 8000
             if "timeout" not in config:
                 config["timeout"] = 60
+            if "max_history" not in config:
+                config["max_history"] = DEFAULT_MAX_HISTORY
 
     def _detect_provider_from_url(self, url):
         """从 URL 检测提供商"""
@@ -114,6 +114,7 @@ TRANSLATIONS = {
         "temperature": "温度：",
         "max_tokens": "最大词元数：",
         "timeout": "超时时间(秒)：",
+        "max_history": "历史消息数：",
         "import_image": "导入图片",
         "paste_image_hint": "或按 Ctrl+V 粘贴图片",
         "tab_prompt": "提示词",
@@ -247,6 +248,7 @@ TRANSLATIONS = {
         "temperature": "Temperature:",
         "max_tokens": "Max Tokens:",
         "timeout": "Timeout (s):",
+        "max_history": "History Messages:",
         "import_image": "Import Image",
         "paste_image_hint": "or press Ctrl+V to paste image",
         "tab_prompt": "Prompts",
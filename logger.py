@@ -6,7 +6,8 @@
 import os
 import json
 import time
-from datetime import datetime
+import atexit
+import threading
 from . import i18n as _i18n
 
 # 日志文件路径
@@ -18,6 +19,9 @@ INFO = "INFO"
 WARNING = "WARNING"
 ERROR = "ERROR"
 
+# 记录日志后延迟写入文件的秒数，期间的多条日志合并为一次写入
+SAVE_DELAY = 1.0
+
 # 日志分类
 USER_INPUT = "USER_INPUT"
 AI_REQUEST = "AI_REQUEST"
@@ -26,6 +30,20 @@ TOOL_CALL = "TOOL_CALL"
 ERRORS = "ERRORS"
 SYSTEM = "SYSTEM"
 
+# 最近一次格式化的时间戳 (秒, 字符串)，同一秒内的日志直接复用
+_last_timestamp = (None, "")
+
+
+def _timestamp():
+    """返回精确到秒的ISO格式本地时间"""
+    global _last_timestamp
+    second = int(time.time())
+    cached_second, text = _last_timestamp
+    if second != cached_second:
+        text = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(second))
+        _last_timestamp = (second, text)
+    return text
+
 
 class Logger:
     """日志管理器"""
@@ -45,7 +63,13 @@ class Logger:
 
         self._logs = []
         self._observers = []
+        # 可重入锁：flush 持锁检查后调用 save
+        self._save_lock = threading.RLock()
+        self._save_timer = None
+        self._dirty = False
         self.load()
+        # 退出时写入尚未保存的日志
+        atexit.register(self.flush)
         self._initialized = True
 
     def add_observer(self, callback):
@@ -78,13 +102,38 @@ class Logger:
 
     def save(self):
         """保存日志到文件"""
-        try:
-            with open(LOG_FILE, "w", encoding="utf-8") as f:
-                json.dump(self._logs, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            print("[PyMOL AI Assistant] 保存日志失败: {}".format(e))
-            return False
+        with self._save_lock:
+            self._cancel_scheduled_save()
+            self._dirty = False
+            # 浅拷贝快照：条目写入后不再修改，其他线程可同时追加新日志
+            logs = list(self._logs)
+            try:
+                with open(LOG_FILE, "w", encoding="utf-8") as f:
+                    json.dump(logs, f, ensure_ascii=False, indent=2)
+                return True
+            except Exception as e:
+                print("[PyMOL AI Assistant] 保存日志失败: {}".format(e))
+                return False
+
+    def _schedule_save(self):
+        """延迟保存：SAVE_DELAY 秒内的多条日志只写一次文件"""
+        with self._save_lock:
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(SAVE_DELAY, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def _cancel_scheduled_save(self):
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+
+    def flush(self):
+        """立即写入尚未保存的日志（持锁，会等待正在进行的保存完成）"""
+        with self._save_lock:
+            if self._dirty:
+                self.save()
 
     def _process_image_data(self, data):
         """
@@ -121,7 +170,7 @@ class Logger:
             data: 附加数据（可选）
         """
         entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _timestamp(),
             "level": level,
             "category": category,
             "message": message,
@@ -143,7 +192,7 @@ class Logger:
             self._logs = self._logs[-self._max_entries:]
 
         self._notify_observers(entry)
-        self.save()
+        self._schedule_save()
 
         return entry
 
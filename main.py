@@ -7,6 +7,8 @@ import os
 import sys
 import json
 import base64
+import time
+from collections import deque
 from datetime import datetime
 
 from pymol.Qt import QtCore, QtWidgets, QtGui
@@ -19,6 +21,8 @@ from . import (
     tools,
     get_update_info,
     __version__ as PLUGIN_VERSION,
+    PLUGIN_DIR,
+    DEPENDENCE_OK_FILE,
     markdown_renderer,
     updater,
 )
@@ -27,11 +31,16 @@ from . import (
 __version__ = PLUGIN_VERSION
 
 _FONT_FAMILY = None
+_FONTS_LOADED = False
 
 
 def _load_custom_fonts():
-    global _FONT_FAMILY
-    font_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+    """注册插件自带字体，每个进程只扫描和读取一次字体文件"""
+    global _FONT_FAMILY, _FONTS_LOADED
+    if _FONTS_LOADED:
+        return
+    _FONTS_LOADED = True
+    font_dir = os.path.join(PLUGIN_DIR, "fonts")
     if not os.path.isdir(font_dir):
         return
     font_db = QtGui.QFontDatabase()
@@ -143,9 +152,117 @@ class StyledButton(QtWidgets.QPushButton):
             """)
 
 
+# 各消息角色的 (标签颜色, 背景颜色)
+_MESSAGE_ROLE_COLORS = {
+    "user": (COLORS["accent_green"], COLORS["bg_message_user"]),
+    "assistant": (COLORS["accent_blue"], COLORS["bg_message_ai"]),
+    "thinking": (COLORS["accent_yellow"], COLORS["bg_message_think"]),
+    "tool": (COLORS["accent_purple"], COLORS["bg_message_tool"]),
+    "tool_result": (COLORS["accent_purple"], COLORS["bg_message_tool"]),
+    "tool_error": (COLORS["accent_purple"], COLORS["bg_message_tool"]),
+}
+
+
+def _build_messages_style():
+    """
+    生成消息区域的样式表
+
+    样式表只设置在消息容器上，消息组件通过 objectName 和 role 属性匹配选择器，
+    新建消息时无需再逐个解析样式表
+    """
+    rules = [
+        "* { background: transparent; }",
+        """
+            #messageWidget {
+                background-color: %s;
+                border: none;
+                border-radius: 12px;
+            }
+            QLabel#messageRole {
+                color: %s;
+                font-size: 14px;
+                background: transparent;
+            }
+        """
+        % (COLORS["bg_panel"], COLORS["text_primary"]),
+    ]
+    for role, (role_color, bg_color) in _MESSAGE_ROLE_COLORS.items():
+        rules.append(
+            '#messageWidget[role="%s"] { background-color: %s; }\n'
+            'QLabel#messageRole[role="%s"] { color: %s; }'
+            % (role, bg_color, role, role_color)
+        )
+    rules.append("""
+            QLabel#messageContent {
+                color: #FFFFFF;
+                font-size: 14px;
+                line-height: 1.6;
+                background: transparent;
+            }
+            QLabel#messageContent::item:selected {
+                background-color: #3d8bfd;
+            }
+            QLabel#messageImage {
+                border: 1px solid #555555;
+                border-radius: 8px;
+                padding: 5px;
+            }
+            QLabel#messageToggle {
+                color: #999999;
+                font-size: 12px;
+                background: transparent;
+            }
+            QLabel#messageDetail {
+                color: #888888;
+                font-size: 12px;
+                background: transparent;
+                padding: 4px 8px;
+                border: 1px solid #444444;
+                border-radius: 4px;
+            }
+        """)
+    return "\n".join(rules)
+
+
+MESSAGES_STYLE = _build_messages_style()
+
+
+# 工具参数/结果详情中单个字符串值的最大显示长度
+_DETAIL_VALUE_LIMIT = 2000
+
+
+def _abbreviate_detail(data, limit=_DETAIL_VALUE_LIMIT):
+    """截断过长的字符串值（如脚本内容），使详情显示开销有上限"""
+    if isinstance(data, str):
+        if len(data) > limit:
+            return "%s …(+%d)" % (data[:limit], len(data) - limit)
+        return data
+    if isinstance(data, dict):
+        return {k: _abbreviate_detail(v, limit) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_abbreviate_detail(v, limit) for v in data]
+    return data
+
+
+def _format_detail(data):
+    """生成工具参数/结果的详情文本"""
+    if isinstance(data, (dict, list)):
+        return json.dumps(_abbreviate_detail(data), ensure_ascii=False, indent=2)
+    return _abbreviate_detail(str(data))
+
+
 class MessageWidget(QtWidgets.QFrame):
     """单条消息组件"""
 
+    # 角色标签：固定文本，或对应的翻译键
+    _ROLE_LABELS = {"user": "User", "assistant": "AI"}
+    _ROLE_LABEL_KEYS = {
+        "thinking": "thinking",
+        "tool": "using_tool",
+        "tool_result": "tool_result",
+        "tool_error": "tool_error",
+    }
+
     def __init__(
         self,
         role,
@@ -163,10 +280,21 @@ class MessageWidget(QtWidgets.QFrame):
         self.tool_params = tool_params
         self.tool_name = tool_name
         self.tool_result = tool_result
+        # 外观由消息容器上的 MESSAGES_STYLE 按 objectName 和 role 属性决定
         self.setObjectName("messageWidget")
+        self.setProperty("role", role)
         self.setup_ui()
         self.set_content(content, self.images)
 
+    @classmethod
+    def role_text(cls, role):
+        """返回角色标签文本（只翻译当前角色的文本）"""
+        text = cls._ROLE_LABELS.get(role)
+        if text is None:
+            key = cls._ROLE_LABEL_KEYS.get(role)
+            text = i18n._(key) if key else role
+        return text
+
     def setup_ui(self):
         # 去掉边框
         self.setFrameShape(QtWidgets.QFrame.NoFrame)
@@ -177,37 +305,12 @@ class MessageWidget(QtWidgets.QFrame):
         layout.setContentsMargins(15, 12, 15, 12)
 
         # 角色标签
-        role_text = {
-            "user": "User",
-            "assistant": "AI",
-            "thinking": i18n._("thinking"),
-            "tool": i18n._("using_tool"),
-            "tool_result": i18n._("tool_result"),
-            "tool_error": i18n._("tool_error"),
-        }.get(self.role, self.role)
+        role_text = self.role_text(self.role)
 
         self.role_label = QtWidgets.QLabel("<b>%s:</b>" % role_text)
+        self.role_label.setObjectName("messageRole")
+        self.role_label.setProperty("role", self.role)
         self._thinking_collapsed = False
-
-        if self.role == "user":
-            role_color = COLORS["accent_green"]
-            self.bg_color = COLORS["bg_message_user"]
-        elif self.role == "assistant":
-            role_color = COLORS["accent_blue"]
-            self.bg_color = COLORS["bg_message_ai"]
-        elif self.role == "thinking":
-            role_color = COLORS["accent_yellow"]
-            self.bg_color = COLORS["bg_message_think"]
-        elif self.role in ["tool", "tool_result", "tool_error"]:
-            role_color = COLORS["accent_purple"]
-            self.bg_color = COLORS["bg_message_tool"]
-        else:
-            role_color = COLORS["text_primary"]
-            self.bg_color = COLORS["bg_panel"]
-
-        self.role_label.setStyleSheet(
-            "color: %s; font-size: 14px; background: transparent;" % role_color
-        )
         layout.addWidget(self.role_label)
 
         # 图片显示区域
@@ -226,17 +329,7 @@ class MessageWidget(QtWidgets.QFrame):
             QtCore.Qt.TextSelectableByMouse | QtCore.Qt.TextSelectableByKeyboard
         )
         self.content_label.setCursor(QtGui.QCursor(QtCore.Qt.IBeamCursor))
-        self.content_label.setStyleSheet("""
-            QLabel {
-                color: #FFFFFF;
-                font-size: 14px;
-                line-height: 1.6;
-                background: transparent;
-            }
-            QLabel::item:selected {
-                background-color: #3d8bfd;
-            }
-        """)
+        self.content_label.setObjectName("messageContent")
         layout.addWidget(self.content_label)
 
         if self.role in ["tool", "tool_result", "tool_error"]:
@@ -255,33 +348,24 @@ class MessageWidget(QtWidgets.QFrame):
                 self.tool_result,
             )
 
-        # 设置背景 - 使用palette而不是stylesheet
-        self.setStyleSheet(
-            """
-            #messageWidget {
-                background-color: %s;
-                border: none;
-                border-radius: 12px;
-            }
-        """
-            % self.bg_color
-        )
-
     def set_content(self, content, images=None):
         """设置内容，支持不同颜色的文本和Markdown渲染"""
         self.raw_content = content
         self.images = images or []
+        self._render_text()
 
+        # 显示图片
+        self._display_images()
+
+    def _render_text(self):
+        """只重新渲染文本内容"""
         if self.role == "assistant":
-            html_content = markdown_renderer.MarkdownRenderer.render(content)
+            html_content = markdown_renderer.MarkdownRenderer.render(self.raw_content)
         else:
-            html_content = self._format_text(content)
+            html_content = self._format_text(self.raw_content)
 
         self.content_label.setText(html_content)
 
-        # 显示图片
-        self._display_images()
-
     def _display_images(self):
         """显示图片"""
         # 清除现有图片
@@ -305,13 +389,7 @@ class MessageWidget(QtWidgets.QFrame):
 
             label = QtWidgets.QLabel()
             label.setPixmap(scaled_pixmap)
-            label.setStyleSheet("""
-                QLabel {
-                    border: 1px solid #555555;
-                    border-radius: 8px;
-                    padding: 5px;
-                }
-            """)
+            label.setObjectName("messageImage")
             label.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
             self.image_layout.addWidget(label)
 
@@ -329,9 +407,7 @@ class MessageWidget(QtWidgets.QFrame):
 
         toggle = QtWidgets.QLabel("▶ %s" % show_text)
         toggle.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
-        toggle.setStyleSheet(
-            "color: #999999; font-size: 12px; background: transparent;"
-        )
+        toggle.setObjectName("messageToggle")
         container_layout.addWidget(toggle)
 
         detail = QtWidgets.QLabel()
@@ -341,17 +417,11 @@ class MessageWidget(QtWidgets.QFrame):
             QtCore.Qt.TextSelectableByMouse | QtCore.Qt.TextSelectableByKeyboard
         )
         detail.setCursor(QtGui.QCursor(QtCore.Qt.IBeamCursor))
-        detail.setStyleSheet(
-            "color: #888888; font-size: 12px; background: transparent; padding: 4px 8px; border: 1px solid #444444; border-radius: 4px;"
-        )
+        detail.setObjectName("messageDetail")
         detail.hide()
         container_layout.addWidget(detail)
 
-        if isinstance(data, (dict, list)):
-            detail.setText(json.dumps(data, ensure_ascii=False, indent=2))
-        else:
-            detail.setText(str(data))
-
+        # 详情文本在首次展开时才生成，多数工具调用从不展开
         def _on_toggle(
             event, _toggle=toggle, _detail=detail, _show=show_text, _hide=hide_text
         ):
@@ -359,6 +429,8 @@ class MessageWidget(QtWidgets.QFrame):
                 _detail.hide()
                 _toggle.setText("▶ %s" % _show)
             else:
+                if not _detail.text():
+                    _detail.setText(_format_detail(data))
                 _detail.show()
                 _toggle.setText("▼ %s" % _hide)
 
@@ -391,8 +463,9 @@ class MessageWidget(QtWidgets.QFrame):
         return "<br>".join(formatted_lines)
 
     def append_content(self, text):
-        """追加内容"""
-        self.set_content(self.raw_content + text)
+        """追加内容（流式输出时只更新文本，不重建图片区域）"""
+        self.raw_content += text
+        self._render_text()
 
     def collapse_thinking_content(self):
         """思考结束后折叠思考内容"""
@@ -404,9 +477,6 @@ class MessageWidget(QtWidgets.QFrame):
             "<b>▶ %s:</b>" % i18n._("thinking_content")
         )
         self.role_label.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
-        self.role_label.setStyleSheet(
-            "color: %s; font-size: 14px; background: transparent;" % COLORS["accent_yellow"]
-        )
         self.role_label.mousePressEvent = self._toggle_thinking
 
     def _toggle_thinking(self, event=None):
@@ -429,9 +499,14 @@ class ChatWidget(QtWidgets.QWidget):
     message_sent = QtCore.Signal(str, list)
     stop_requested = QtCore.Signal()
 
+    # 界面中保留的消息组件上限，更早的组件被释放，只保留文本用于历史
+    MAX_MESSAGE_WIDGETS = 200
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.messages = []
+        # self.messages 中前 _evicted_count 条的组件已被释放
+        self._evicted_count = 0
         self.current_message_widget = None
         self.is_thinking = False
         self.is_streaming = False
@@ -439,6 +514,15 @@ class ChatWidget(QtWidgets.QWidget):
         self.loading_timer = QtCore.QTimer()
         self.loading_timer.timeout.connect(self._update_loading_animation)
         self.current_images = []
+        # 流式文本缓冲：合并一帧内收到的片段后一次性渲染
+        self._pending_text = []
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(33)
+        self._flush_timer.timeout.connect(self.flush_pending)
+        # 是否贴底跟随：用户停留在底部时为 True，向上滚动查看历史时为 False。
+        # 内容高度变化由滚动条 rangeChanged 通知，贴底时随之滚动到底部
+        self._stick_bottom = True
         self.setup_ui()
 
     def setup_ui(self):
@@ -498,7 +582,7 @@ class ChatWidget(QtWidgets.QWidget):
 
         # 消息容器 - 使用透明背景
         self.messages_container = QtWidgets.QWidget()
-        self.messages_container.setStyleSheet("background: transparent;")
+        self.messages_container.setStyleSheet(MESSAGES_STYLE)
         self.messages_layout = QtWidgets.QVBoxLayout(self.messages_container)
         self.messages_layout.setSpacing(10)
         self.messages_layout.setContentsMargins(5, 5, 5, 5)
@@ -509,6 +593,10 @@ class ChatWidget(QtWidgets.QWidget):
 
         scroll.setWidget(self.messages_container)
         chat_layout.addWidget(scroll)
+        self.scroll_area = scroll
+        scrollbar = scroll.verticalScrollBar()
+        scrollbar.rangeChanged.connect(self._on_scroll_range_changed)
+        scrollbar.valueChanged.connect(self._on_scroll_value_changed)
 
         layout.addWidget(self.chat_panel, stretch=1)
 
@@ -617,6 +705,7 @@ class ChatWidget(QtWidgets.QWidget):
                     return True
         return super().eventFilter(obj, event)
 
+    @QtCore.Slot()
     def on_send_clicked(self):
         """发送按钮点击"""
         if self.is_streaming:
@@ -634,6 +723,7 @@ class ChatWidget(QtWidgets.QWidget):
             self.message_sent.emit(text, images_to_send)
             self.set_streaming_state(True)
 
+    @QtCore.Slot()
     def import_image(self):
         """导入图片"""
         filename, _ = QtWidgets.QFileDialog.getOpenFileName(
@@ -763,6 +853,7 @@ class ChatWidget(QtWidgets.QWidget):
             self.send_btn.danger = False
             self.send_btn.update_style()
 
+    @QtCore.Slot()
     def _update_loading_animation(self):
         """更新加载动画 - 旋转指示器"""
         spinner_chars = ["⠋", "⠙", "⠹", "⠸", "⠼", "⠴", "⠦", "⠧", "⠇", "⠏"]
@@ -803,6 +894,8 @@ class ChatWidget(QtWidgets.QWidget):
         tool_result=None,
     ):
         """添加消息 - 插入到加载指示器之前"""
+        # 先把缓冲的流式文本写入上一条消息
+        self.flush_pending()
         msg_widget = MessageWidget(
             role,
             content,
@@ -818,31 +911,67 @@ class ChatWidget(QtWidgets.QWidget):
         self.messages_layout.insertWidget(insert_pos, msg_widget)
         self.messages.append({"role": role, "widget": msg_widget, "images": images})
         self.current_message_widget = msg_widget
-        self.scroll_to_bottom()
+        self._evict_old_widgets()
+        # 用户自己发送的消息总是滚动到底部，其余只在用户停留在底部时跟随
+        if role == "user":
+            self.scroll_to_bottom()
         return msg_widget
 
+    def _evict_old_widgets(self):
+        """消息组件超过上限时释放最早的组件，其文本仍保留在 self.messages 中"""
+        while len(self.messages) - self._evicted_count > self.MAX_MESSAGE_WIDGETS:
+            msg = self.messages[self._evicted_count]
+            widget = msg["widget"]
+            msg["content"] = widget.raw_content
+            msg["widget"] = None
+            msg["images"] = None
+            self.messages_layout.removeWidget(widget)
+            widget.deleteLater()
+            self._evicted_count += 1
+
     def start_message(self, role):
         """开始一条新消息"""
         self.current_message_widget = self.add_message(role, "")
         return self.current_message_widget
 
     def append_to_current(self, text):
-        """追加到当前消息"""
+        """追加到当前消息（先缓冲，由定时器合并后刷新）"""
+        if self.current_message_widget:
+            self._pending_text.append(text)
+            if not self._flush_timer.isActive():
+                self._flush_timer.start()
+
+    @QtCore.Slot()
+    def flush_pending(self):
+        """将缓冲的流式文本一次性追加到当前消息"""
+        self._flush_timer.stop()
+        if not self._pending_text:
+            return
+        text = "".join(self._pending_text)
+        self._pending_text.clear()
         if self.current_message_widget:
+            # 内容变高后由 rangeChanged 负责跟随滚动
             self.current_message_widget.append_content(text)
-            self.scroll_to_bottom()
 
     def scroll_to_bottom(self):
-        """滚动到底部"""
-        QtCore.QTimer.singleShot(50, self._do_scroll)
-
-    def _do_scroll(self):
-        if self.messages_container.parent():
-            scroll = self.messages_container.parent().parent()
-            if isinstance(scroll, QtWidgets.QScrollArea):
-                scrollbar = scroll.verticalScrollBar()
-                scrollbar.setValue(scrollbar.maximum())
-
+        """滚动到底部，并在之后的内容增长中保持贴底"""
+        self._stick_bottom = True
+        scrollbar = self.scroll_area.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
+    @QtCore.Slot(int, int)
+    def _on_scroll_range_changed(self, minimum, maximum):
+        """布局更新导致滚动范围变化时，贴底状态下滚动到新的底部"""
+        if self._stick_bottom:
+            self.scroll_area.verticalScrollBar().setValue(maximum)
+
+    @QtCore.Slot(int)
+    def _on_scroll_value_changed(self, value):
+        """用户未向上滚动查看历史时才自动跟随新内容"""
+        scrollbar = self.scroll_area.verticalScrollBar()
+        self._stick_bottom = value >= scrollbar.maximum() - 20
+
+    @QtCore.Slot()
     def clear_chat(self):
         """清空对话"""
         reply = QtWidgets.QMessageBox.question(
@@ -853,20 +982,30 @@ class ChatWidget(QtWidgets.QWidget):
         )
 
         if reply == QtWidgets.QMessageBox.Yes:
-            for msg in self.messages:
+            self._flush_timer.stop()
+            self._pending_text.clear()
+            for msg in self.messages[self._evicted_count:]:
                 msg["widget"].deleteLater()
             self.messages.clear()
+            self._evicted_count = 0
             self.current_message_widget = None
 
-    def get_messages_for_api(self):
-        """获取API用的消息历史"""
+    def get_messages_for_api(self, max_messages=config.DEFAULT_MAX_HISTORY):
+        """获取API用的消息历史（只保留最近 max_messages 条）"""
+        self.flush_pending()
         api_messages = []
         for msg in self.messages:
             role = msg["role"]
             if role in ["user", "assistant"]:
-                api_messages.append(
-                    {"role": role, "content": msg["widget"].raw_content}
-                )
+                widget = msg["widget"]
+                content = widget.raw_content if widget is not None else msg["content"]
+                api_messages.append({"role": role, "content": content})
+
+        # 只保留最近的消息，并保证窗口以用户消息开头
+        if len(api_messages) > max_messages:
+            api_messages = api_messages[-max_messages:]
+            while api_messages and api_messages[0]["role"] != "user":
+                api_messages.pop(0)
         return api_messages
 
 
@@ -895,6 +1034,7 @@ class ConfigWidget(QtWidgets.QWidget):
             self.labels.get("temp_label").setText(i18n._("temperature"))
             self.labels.get("tokens_label").setText(i18n._("max_tokens"))
             self.labels.get("timeout_label").setText(i18n._("timeout"))
+            self.labels.get("history_label").setText(i18n._("max_history"))
 
         if hasattr(self, "reasoning_checkbox"):
             self.reasoning_checkbox.setText(i18n._("reasoning_model"))
@@ -1242,6 +1382,16 @@ class ConfigWidget(QtWidgets.QWidget):
         advanced_layout.addWidget(self.labels["timeout_label"], 2, 0)
         advanced_layout.addWidget(self.timeout_spin, 2, 1)
 
+        self.labels["history_label"] = QtWidgets.QLabel(i18n._("max_history"))
+        self.labels["history_label"].setStyleSheet("color: #AAAAAA; font-size: 12px;")
+        self.max_history_spin = QtWidgets.QSpinBox()
+        self.max_history_spin.setRange(2, 200)
+        self.max_history_spin.setSingleStep(2)
+        self.max_history_spin.setValue(config.DEFAULT_MAX_HISTORY)
+        self.max_history_spin.setStyleSheet(spin_style)
+        advanced_layout.addWidget(self.labels["history_label"], 3, 0)
+        advanced_layout.addWidget(self.max_history_spin, 3, 1)
+
         self.advanced_frame.hide()
         panel_layout.addWidget(self.advanced_frame)
 
@@ -1369,6 +1519,7 @@ class ConfigWidget(QtWidgets.QWidget):
 
         self.on_provider_changed(0)
 
+    @QtCore.Slot()
     def toggle_advanced(self):
         """切换高级设置显示"""
         if self.advanced_frame.isVisible():
@@ -1378,6 +1529,7 @@ class ConfigWidget(QtWidgets.QWidget):
             self.advanced_frame.show()
             self.advanced_toggle.setText(i18n._("hide_advanced"))
 
+    @QtCore.Slot()
     def on_save_prompts(self):
         prompts = {
             "pymol_do_command": self.do_cmd_edit.toPlainText(),
@@ -1388,6 +1540,7 @@ class ConfigWidget(QtWidgets.QWidget):
             self, i18n._("save_prompts"), i18n._("prompts_saved")
         )
 
+    @QtCore.Slot()
     def on_reset_prompts(self):
         from . import tools
         defaults = tools.get_default_tool_prompts()
@@ -1398,6 +1551,7 @@ class ConfigWidget(QtWidgets.QWidget):
             self, i18n._("reset_prompts"), i18n._("prompts_reset")
         )
 
+    @QtCore.Slot(int)
     def on_provider_changed(self, index):
         """提供商改变时更新模型列表和表单"""
         provider_id = self.provider_combo.currentData()
@@ -1445,6 +1599,7 @@ class ConfigWidget(QtWidgets.QWidget):
         self.version_edit.setVisible(requires_version)
         self.labels["version_label"].setVisible(requires_version)
 
+    @QtCore.Slot(int)
     def on_model_changed(self, index):
         if self.model_combo.currentText() == i18n._("custom_model"):
             self.model_combo.setEditText("")
@@ -1455,18 +1610,26 @@ class ConfigWidget(QtWidgets.QWidget):
         current = config.config_manager.get_current_config()
         current_name = current.get("name") if current else None
 
+        current_suffix = i18n._("current_use")
+        items = []
+        # 列表行号对应的配置名称，选中时按行号取名，无需解析显示文本
+        self._config_names = []
         for cfg in config.config_manager.get_all_configs():
             name = cfg.get("name", "")
             display = name
             if name == current_name:
-                display = "%s %s" % (name, i18n._("current_use"))
-            self.config_list.addItem(display)
+                display = "%s %s" % (name, current_suffix)
+            items.append(display)
+            self._config_names.append(name)
+        # 一次性批量添加，只触发一次列表布局
+        self.config_list.addItems(items)
 
         if current_name:
             self.load_config_to_form(current)
 
+    @QtCore.Slot(QtWidgets.QListWidgetItem)
     def on_config_selected(self, item):
-        name = item.text().replace(" %s" % i18n._("current_use"), "")
+        name = self._config_names[self.config_list.row(item)]
         cfg = config.config_manager.get_config(name)
         if cfg:
             self.load_config_to_form(cfg)
@@ -1496,6 +1659,9 @@ class ConfigWidget(QtWidgets.QWidget):
         self.temp_spin.setValue(cfg.get("temperature", 0.7))
         self.max_tokens_spin.setValue(cfg.get("max_tokens", 8000))
         self.timeout_spin.setValue(cfg.get("timeout", 60))
+        self.max_history_spin.setValue(
+            cfg.get("max_history", config.DEFAULT_MAX_HISTORY)
+        )
 
         current = config.config_manager.get_current_config()
         self.current_checkbox.setChecked(
@@ -1514,13 +1680,16 @@ class ConfigWidget(QtWidgets.QWidget):
         self.temp_spin.setValue(0.7)
         self.max_tokens_spin.setValue(8000)
         self.timeout_spin.setValue(60)
+        self.max_history_spin.setValue(config.DEFAULT_MAX_HISTORY)
         self.provider_combo.setCurrentIndex(0)
         self.on_provider_changed(0)
 
+    @QtCore.Slot()
     def on_new(self):
         self.clear_form()
         self.config_list.clearSelection()
 
+    @QtCore.Slot()
     def on_save(self):
         name = self.name_edit.text().strip()
         provider_id = self.provider_combo.currentData()
@@ -1552,6 +1721,7 @@ class ConfigWidget(QtWidgets.QWidget):
             "temperature": self.temp_spin.value(),
             "max_tokens": self.max_tokens_spin.value(),
             "timeout": self.timeout_spin.value(),
+            "max_history": self.max_history_spin.value(),
         }
 
         if config.config_manager.add_config(cfg):
@@ -1564,6 +1734,7 @@ class ConfigWidget(QtWidgets.QWidget):
         else:
             self.show_error(i18n._("config_save_failed"))
 
+    @QtCore.Slot()
     def on_delete(self):
         name = self.name_edit.text().strip()
         if not name:
@@ -1584,6 +1755,7 @@ class ConfigWidget(QtWidgets.QWidget):
                 self.load_configs()
                 self.config_changed.emit()
 
+    @QtCore.Slot()
     def on_test(self):
         provider_id = self.provider_combo.currentData()
         url = self.url_edit.text().strip()
@@ -1610,6 +1782,7 @@ class ConfigWidget(QtWidgets.QWidget):
         else:
             self.show_error(i18n._("test_failed", msg))
 
+    @QtCore.Slot()
     def on_import(self):
         filename, _ = QtWidgets.QFileDialog.getOpenFileName(
             self, "Import Configuration", "", "JSON Files (*.json)"
@@ -1622,6 +1795,7 @@ class ConfigWidget(QtWidgets.QWidget):
             else:
                 self.show_error(i18n._("config_import_failed"))
 
+    @QtCore.Slot()
     def on_export(self):
         filename, _ = QtWidgets.QFileDialog.getSaveFileName(
             self, "Export Configuration", "pymol_ai_config.json", "JSON Files (*.json)"
@@ -1645,11 +1819,34 @@ class ConfigWidget(QtWidgets.QWidget):
 class LogWidget(QtWidgets.QWidget):
     """日志标签页"""
 
+    # 日志类别对应的颜色
+    _CATEGORY_COLORS = {
+        "USER_INPUT": "#58D68D",  # 绿色
+        "AI_REQUEST": "#5DADE2",  # 蓝色
+        "AI_RESPONSE": "#AF7AC5",  # 紫色
+        "TOOL_CALL": "#F5B041",  # 黄色
+        "ERRORS": "#F07178",  # 红色
+    }
+
+    # 日志可能来自工作线程，通过信号（队列连接）通知GUI线程刷新
+    _entries_pending = QtCore.Signal()
+
+    # 待显示队列上限（超出时丢弃最旧的条目）与每次刷新最多显示的条目数
+    MAX_PENDING = 10000
+    FLUSH_BATCH = 200
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        # 待显示的日志条目，由定时器在GUI线程中批量刷新
+        self._pending = deque(maxlen=self.MAX_PENDING)
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(50)
+        self._flush_timer.timeout.connect(self._flush_pending)
+        self._entries_pending.connect(self._schedule_flush)
         self.setup_ui()
-        self.load_logs()
-        logger.logger.add_observer(self.on_log_entry)
+        # 首次显示日志页时才加载历史并订阅，见 showEvent
+        self._attached = False
 
     def update_language(self):
         """更新界面语言"""
@@ -1752,10 +1949,12 @@ class LogWidget(QtWidgets.QWidget):
         log_layout = QtWidgets.QVBoxLayout(log_panel)
         log_layout.setContentsMargins(10, 10, 10, 10)
 
-        self.log_text = QtWidgets.QTextEdit()
+        # QPlainTextEdit 追加日志时无需富文本整体排版，并可限制最大行数控制内存
+        self.log_text = QtWidgets.QPlainTextEdit()
         self.log_text.setReadOnly(True)
+        self.log_text.setMaximumBlockCount(5000)
         self.log_text.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #1E1E1E;
                 color: #FFFFFF;
                 border: none;
@@ -1767,78 +1966,142 @@ class LogWidget(QtWidgets.QWidget):
         """)
         log_layout.addWidget(self.log_text)
 
+        # 各类别的字符格式只创建一次，追加日志时直接插入纯文本，无需解析 HTML
+        self._timestamp_format = self._char_format("#888888")
+        self._message_format = self._char_format("#FFFFFF")
+        self._category_formats = {
+            category: self._char_format(color)
+            for category, color in self._CATEGORY_COLORS.items()
+        }
+
         layout.addWidget(log_panel, stretch=1)
 
+    @staticmethod
+    def _char_format(color):
+        fmt = QtGui.QTextCharFormat()
+        fmt.setForeground(QtGui.QColor(color))
+        return fmt
+
     def load_logs(self):
+        self._pending.clear()
         self.log_text.clear()
         category = self.category_combo.currentData()
         logs = logger.logger.get_logs(category=category, limit=500)
 
-        for entry in logs:
-            self.append_log_entry(entry)
+        # 批量加载时暂停重绘，全部追加后只刷新和滚动一次
+        self.log_text.setUpdatesEnabled(False)
+        try:
+            self._append_entries(logs)
+        finally:
+            self.log_text.setUpdatesEnabled(True)
+        self._scroll_to_end()
+
+    def append_log_entry(self, entry, scroll=True):
+        self._append_entries((entry,))
+        if scroll:
+            self._scroll_to_end()
+
+    def _append_entries(self, entries):
+        """在同一个编辑块中追加多条日志，文档只在结束时重新排版一次"""
+        cursor = QtGui.QTextCursor(self.log_text.document())
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.beginEditBlock()
+        try:
+            for entry in entries:
+                self._insert_entry(cursor, entry)
+        finally:
+            cursor.endEditBlock()
 
-    def append_log_entry(self, entry):
+    def _insert_entry(self, cursor, entry):
         timestamp = entry.get("timestamp", "")[:19]
         category = entry.get("category", "UNKNOWN")
         message = entry.get("message", "")
         data = entry.get("data")
 
-        # 根据类别设置颜色
-        colors = {
-            "USER_INPUT": "#58D68D",  # 绿色
-            "AI_REQUEST": "#5DADE2",  # 蓝色
-            "AI_RESPONSE": "#AF7AC5",  # 紫色
-            "TOOL_CALL": "#F5B041",  # 黄色
-            "ERRORS": "#F07178",  # 红色
-        }
-        color = colors.get(category, "#FFFFFF")
-
-        # 构建日志行
-        log_line = '<span style="color: #888888">[%s]</span> ' % timestamp
-        log_line += '<span style="color: %s">[%s]</span> ' % (color, category)
-        log_line += "%s" % message.replace("<", "&lt;").replace(">", "&gt;")
+        # 每条日志占一个文本块（受 setMaximumBlockCount 限制），块内用行分隔符换行
+        if not self.log_text.document().isEmpty():
+            cursor.insertBlock()
+        cursor.insertText("[%s] " % timestamp, self._timestamp_format)
+        cursor.insertText(
+            "[%s] " % category,
+            self._category_formats.get(category, self._message_format),
+        )
+        cursor.insertText(message.replace("\n", "\u2028"), self._message_format)
 
         # 如果有数据，格式化显示
         if data:
             try:
-                if isinstance(data, dict):
-                    data_str = json.dumps(data, ensure_ascii=False, indent=2)
-                else:
-                    data_str = str(data)
-                data_str = data_str.replace("<", "&lt;").replace(">", "&gt;")
-                log_line += (
-                    '<br><span style="color: #888888; margin-left: 20px; font-size: 11px;">%s</span>'
-                    % data_str.replace("\n", "<br>")
+                # 与工具详情共用格式化逻辑，过长的字符串值被截断
+                data_str = _format_detail(data)
+                cursor.insertText(
+                    "\u2028" + data_str.replace("\n", "\u2028"),
+                    self._timestamp_format,
                 )
             except Exception:
                 pass
 
-        log_line += "<br>"
-
-        self.log_text.insertHtml(log_line)
-
+    def _scroll_to_end(self):
         if self.auto_scroll.isChecked():
             scrollbar = self.log_text.verticalScrollBar()
             scrollbar.setValue(scrollbar.maximum())
 
     def on_log_entry(self, entry):
-        QtCore.QTimer.singleShot(0, lambda: self.handle_new_entry(entry))
-
-    def handle_new_entry(self, entry):
+        # 可能在任意线程调用：入队后总是通知GUI线程。
+        # _schedule_flush 在定时器已启动时直接返回，重复通知开销很小；
+        # 若只在队列由空变非空时通知，会与GUI线程的取出操作竞争而漏掉通知
+        self._pending.append(entry)
+        self._entries_pending.emit()
+
+    @QtCore.Slot()
+    def _schedule_flush(self):
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    @QtCore.Slot()
+    def _flush_pending(self):
+        """批量显示缓冲的日志条目，每批只滚动一次"""
         category_filter = self.category_combo.currentData()
-        if category_filter and entry.get("category") != category_filter:
-            return
-        self.append_log_entry(entry)
-
-    def on_filter_changed(self):
+        entries = []
+        # 逐条 popleft：其他线程可能同时入队，不能直接遍历队列
+        for _ in range(self.FLUSH_BATCH):
+            if not self._pending:
+                break
+            entry = self._pending.popleft()
+            if category_filter and entry.get("category") != category_filter:
+                continue
+            entries.append(entry)
+        if entries:
+            self._append_entries(entries)
+            self._scroll_to_end()
+        # 剩余条目留到下一次刷新，避免单次占用GUI线程过久
+        if self._pending:
+            self._flush_timer.start()
+
+    @QtCore.Slot(int)
+    def on_filter_changed(self, index=None):
         self.load_logs()
 
+    @QtCore.Slot()
     def on_clear(self):
         logger.logger.clear()
+        self._pending.clear()
         self.log_text.clear()
 
+    def showEvent(self, event):
+        self.attach()
+        super().showEvent(event)
+
+    def attach(self):
+        """订阅日志更新；对话框关闭后再次显示时重新订阅并补齐期间的日志"""
+        if self._attached:
+            return
+        self._attached = True
+        self.load_logs()
+        logger.logger.add_observer(self.on_log_entry)
+
     def cleanup(self):
         logger.logger.remove_observer(self.on_log_entry)
+        self._attached = False
 
 
 class AboutDialog(QtWidgets.QDialog):
@@ -1955,6 +2218,7 @@ class AboutDialog(QtWidgets.QDialog):
         close_btn.clicked.connect(self.accept)
         layout.addWidget(close_btn, alignment=QtCore.Qt.AlignCenter)
 
+    @QtCore.Slot()
     def show_donate(self):
         """显示捐赠二维码"""
         donate_dialog = QtWidgets.QDialog(self)
@@ -1993,7 +2257,7 @@ class AboutDialog(QtWidgets.QDialog):
         layout.addSpacing(10)
 
         # 加载二维码图片
-        qr_path = os.path.join(os.path.dirname(__file__), "fig", "donate.png")
+        qr_path = os.path.join(PLUGIN_DIR, "fig", "donate.png")
 
         qr_label = QtWidgets.QLabel()
         if os.path.exists(qr_path):
@@ -2074,8 +2338,18 @@ class AIAssistantDialog(QtWidgets.QDialog):
         # 添加语言变更回调
         i18n.add_language_change_callback(self._on_language_changed)
 
+        # 已停止但线程尚未退出的工作线程，保持引用直到其结束
+        self._retired_workers = set()
+
         self.setup_ui()
         self.init_ai_client()
+        # 对话框显示时在后台加载 LiteLLM，首次发送消息无需等待
+        ai_client.prewarm()
+
+    def showEvent(self, event):
+        # 关闭后对话框被隐藏而非销毁，再次显示时恢复回调
+        i18n.add_language_change_callback(self._on_language_changed)
+        super().showEvent(event)
 
     def closeEvent(self, event):
         i18n.remove_language_change_callback(self._on_language_changed)
@@ -2188,6 +2462,7 @@ class AIAssistantDialog(QtWidgets.QDialog):
         # 我们将在setup_ui中使用这个方法
         self._menu_layout = menu_layout
 
+    @QtCore.Slot()
     def show_update_dialog(self):
         """显示更新对话框"""
         from . import get_update_info
@@ -2362,11 +2637,8 @@ class AIAssistantDialog(QtWidgets.QDialog):
 
         is_en = i18n.get_language() == "en"
 
-        dep_ok_file = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), "dependence_ok"
-        )
-        if os.path.exists(dep_ok_file):
-            os.remove(dep_ok_file)
+        if os.path.exists(DEPENDENCE_OK_FILE):
+            os.remove(DEPENDENCE_OK_FILE)
 
         # 创建进度对话框
         progress = QProgressDialog(dialog)
@@ -2494,6 +2766,7 @@ class AIAssistantDialog(QtWidgets.QDialog):
         else:
             return "中文"
 
+    @QtCore.Slot()
     def toggle_language(self):
         """点击切换语言"""
         current_lang = i18n.get_language()
@@ -2531,14 +2804,9 @@ class AIAssistantDialog(QtWidgets.QDialog):
         for msg in self.chat_widget.messages:
             role = msg["role"]
             widget = msg["widget"]
-            role_text = {
-                "user": i18n._("user"),
-                "assistant": i18n._("assistant"),
-                "thinking": i18n._("thinking"),
-                "tool": i18n._("using_tool"),
-                "tool_result": i18n._("tool_result"),
-                "tool_error": i18n._("tool_error"),
-            }.get(role, role)
+            if widget is None:
+                continue
+            role_text = MessageWidget.role_text(role)
             if role == "thinking" and getattr(widget, "_thinking_collapsed", False):
                 collapsed = widget._thinking_collapsed
                 arrow = "▶" if collapsed else "▼"
@@ -2552,6 +2820,7 @@ class AIAssistantDialog(QtWidgets.QDialog):
         self.config_widget.update_language()
         self.log_widget.update_language()
 
+    @QtCore.Slot()
     def show_about_dialog(self):
         """显示关于对话框"""
         dialog = AboutDialog(self)
@@ -2567,6 +2836,7 @@ class AIAssistantDialog(QtWidgets.QDialog):
             is_vision = cfg.get("is_vision_model", False)
             self.chat_widget.update_vision_mode(is_vision)
 
+    @QtCore.Slot(str, list)
     def on_message_sent(self, text, images=None):
         cfg = config.config_manager.get_current_config()
         if not cfg:
@@ -2594,7 +2864,9 @@ class AIAssistantDialog(QtWidgets.QDialog):
         )
 
         # 获取历史消息（用于上下文）
-        history_messages = self.chat_widget.get_messages_for_api()
+        history_messages = self.chat_widget.get_messages_for_api(
+            cfg.get("max_history", config.DEFAULT_MAX_HISTORY)
+        )
 
         # 如果有图片，需要为最后一条用户消息添加图片信息
         if images:
@@ -2650,10 +2922,11 @@ class AIAssistantDialog(QtWidgets.QDialog):
         # 显示加载指示器
         self.chat_widget.show_loading()
 
+    @QtCore.Slot()
     def on_stop_requested(self):
         """用户请求停止"""
         if hasattr(self, "worker") and self.worker.isRunning():
-            self.worker.terminate()
+            self._retire_worker(self.worker)
             self.chat_widget.hide_loading()
             self.chat_widget.set_streaming_state(False)
             if (
@@ -2665,6 +2938,27 @@ class AIAssistantDialog(QtWidgets.QDialog):
             self.chat_widget.is_thinking = False
             self.chat_widget.add_message("assistant", "[已停止]")
 
+    def _retire_worker(self, worker):
+        """停止工作线程：断开其信号，并在线程真正结束前保留引用"""
+        worker.terminate()
+        for signal in (
+            worker.thinking_signal,
+            worker.content_signal,
+            worker.tool_signal,
+            worker.error_signal,
+            worker.finished_signal,
+        ):
+            try:
+                signal.disconnect()
+            except (TypeError, RuntimeError):
+                pass
+        self._retired_workers.add(worker)
+        worker.finished.connect(lambda: self._retired_workers.discard(worker))
+        # 已经结束的线程不会再发出 finished，直接移除
+        if not worker.isRunning():
+            self._retired_workers.discard(worker)
+
+    @QtCore.Slot(str, bool)
     def on_thinking(self, text, is_end):
         # 显示 reasoning content
         if text:
@@ -2673,10 +2967,12 @@ class AIAssistantDialog(QtWidgets.QDialog):
                 self.chat_widget.start_message("thinking")
             self.chat_widget.append_to_current(text)
         if is_end:
+            self.chat_widget.flush_pending()
             self.chat_widget.is_thinking = False
             if self.chat_widget.current_message_widget and self.chat_widget.current_message_widget.role == "thinking":
                 self.chat_widget.current_message_widget.collapse_thinking_content()
 
+    @QtCore.Slot(str, bool)
     def on_content(self, text, is_end):
         if text:
             if self.chat_widget.is_thinking:
@@ -2694,19 +2990,12 @@ class AIAssistantDialog(QtWidgets.QDialog):
                 self.chat_widget.start_message("assistant")
             self.chat_widget.append_to_current(text)
 
-    def on_tool_call(self, tool_name, params, result):
-        if result is None:
-            return
-
-        if (
-            tool_name == "pymol_capture_view"
-            and result.get("success")
-            and result.get("image_data")
-        ):
-            image_data = result.get("image_data")
-            img_bytes = base64.b64decode(image_data)
+    @QtCore.Slot(str, str, str, object)
+    def on_tool_call(self, tool_name, params, result_text, image_bytes):
+        """显示工具调用结果（文本和截图已在工作线程中提取/解码）"""
+        if image_bytes:
             pixmap = QtGui.QPixmap()
-            pixmap.loadFromData(img_bytes)
+            pixmap.loadFromData(image_bytes)
 
             if not pixmap.isNull():
                 self.chat_widget.add_message(
@@ -2715,13 +3004,10 @@ class AIAssistantDialog(QtWidgets.QDialog):
                     images=[{"pixmap": pixmap, "preview": pixmap}],
                     tool_params=params,
                     tool_name=tool_name,
-                    tool_result=result.get("message"),
+                    tool_result=result_text,
                 )
                 return
 
-        result_text = (
-            result if isinstance(result, str) else result.get("message", str(result))
-        )
         self.chat_widget.add_message(
             "tool",
             tool_name,
@@ -2730,6 +3016,7 @@ class AIAssistantDialog(QtWidgets.QDialog):
             tool_result=result_text,
         )
 
+    @QtCore.Slot(str)
     def on_error(self, error_msg):
         # 记录错误到日志
         logger.logger.error(logger.ERRORS, "AI请求错误", {"error": error_msg})
@@ -2744,10 +3031,13 @@ class AIAssistantDialog(QtWidgets.QDialog):
         self.chat_widget.hide_loading()
         self.chat_widget.set_streaming_state(False)
 
+    @QtCore.Slot()
     def on_request_finished(self):
+        self.chat_widget.flush_pending()
         self.chat_widget.hide_loading()
         self.chat_widget.set_streaming_state(False)
 
+    @QtCore.Slot()
     def on_config_changed(self):
         self.init_ai_client()
 
@@ -2763,10 +3053,14 @@ class AIStreamWorker(QtCore.QThread):
 
     thinking_signal = QtCore.Signal(str, bool)
     content_signal = QtCore.Signal(str, bool)
-    tool_signal = QtCore.Signal(str, object, object)
+    # 工具名, 参数JSON字符串, 结果文本, 截图PNG数据(bytes或None)
+    tool_signal = QtCore.Signal(str, str, str, object)
     error_signal = QtCore.Signal(str)
     finished_signal = QtCore.Signal()
 
+    # 流式文本跨线程发送的最小间隔（秒），期间收到的片段合并后一次发送
+    EMIT_INTERVAL = 0.033
+
     def __init__(self, messages, images=None):
         super().__init__()
         self.messages = messages
@@ -2774,6 +3068,52 @@ class AIStreamWorker(QtCore.QThread):
         self._is_running = True
 
     def run(self):
+        # 待发送的流式片段："thinking" 或 "content"，同一时刻只缓冲一种
+        pending_kind = None
+        pending_parts = []
+        last_emit = 0.0
+
+        def flush():
+            nonlocal last_emit
+            if pending_parts:
+                text = "".join(pending_parts)
+                pending_parts.clear()
+                if self._is_running:
+                    signal = (
+                        self.thinking_signal
+                        if pending_kind == "thinking"
+                        else self.content_signal
+                    )
+                    signal.emit(text, False)
+            last_emit = time.monotonic()
+
+        def flush_if_due():
+            if pending_parts and time.monotonic() - last_emit >= self.EMIT_INTERVAL:
+                flush()
+
+        def push(kind, text, is_end):
+            nonlocal pending_kind
+            if pending_kind != kind:
+                flush()
+                pending_kind = kind
+            if text:
+                pending_parts.append(text)
+            if is_end:
+                flush()
+                if self._is_running:
+                    signal = (
+                        self.thinking_signal if kind == "thinking" else self.content_signal
+                    )
+                    signal.emit("", True)
+            else:
+                flush_if_due()
+
+        def should_stop():
+            # chat() 对每个流式分片调用一次（包括只含 tool_calls 的分片），
+            # 借此按时间发送缓冲的文本，避免其滞留到工具参数流式输出结束
+            flush_if_due()
+            return not self._is_running
+
         try:
             accumulated_content = ""
             accumulated_thinking = ""
@@ -2782,20 +3122,37 @@ class AIStreamWorker(QtCore.QThread):
                 if self._is_running:
                     nonlocal accumulated_thinking
                     accumulated_thinking += text
-                    self.thinking_signal.emit(text, is_end)
+                    push("thinking", text, is_end)
 
             def on_content(text, is_end):
                 if self._is_running:
                     nonlocal accumulated_content
                     accumulated_content += text
-                    self.content_signal.emit(text, is_end)
+                    push("content", text, is_end)
 
             def on_tool_call(tool_name, params, result):
-                if self._is_running:
-                    self.tool_signal.emit(tool_name, params, result)
+                # 执行前的预览回调（result 为 None）界面不显示，不跨线程投递
+                if self._is_running and result is not None:
+                    flush()
+                    # 只把界面需要显示的文本和图片数据传给GUI线程，截图在此解码
+                    image_bytes = None
+                    if isinstance(result, str):
+                        result_text = result
+                    elif (
+                        tool_name == "pymol_capture_view"
+                        and result.get("success")
+                        and result.get("image_data")
+                    ):
+                        result_text = str(result.get("message") or "")
+                        image_bytes = base64.b64decode(result["image_data"])
+                    else:
+                        message = result.get("message")
+                        result_text = str(result) if message is None else str(message)
+                    self.tool_signal.emit(tool_name, params, result_text, image_bytes)
 
             def on_error(error_msg):
                 if self._is_running:
+                    flush()
                     self.error_signal.emit(error_msg)
 
             result = ai_client.ai_client.chat(
@@ -2805,6 +3162,7 @@ class AIStreamWorker(QtCore.QThread):
                 on_tool_call=on_tool_call,
                 on_error=on_error,
                 images=self.images,
+                should_stop=should_stop,
             )
 
             logger.logger.info(
@@ -2819,10 +3177,13 @@ class AIStreamWorker(QtCore.QThread):
 
         except Exception as e:
             if self._is_running:
+                flush()
                 self.error_signal.emit(str(e))
 
         finally:
+            flush()
             self.finished_signal.emit()
 
     def terminate(self):
+        # 协作式停止：chat() 在下一个流式片段或下一个工具调用前检查并退出
         self._is_running = False
@@ -1004,20 +1004,24 @@ class ToolExecutor:
         feedback_text = "\n".join(feedback) if feedback else ""
         return result, feedback_text
 
-    def execute(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    def execute(self, tool_name: str, arguments: Dict[str, Any], arguments_str: Optional[str] = None) -> Dict[str, Any]:
         """
         执行指定的 PyMOL 工具
 
         Args:
             tool_name: 工具名称
             arguments: 工具参数
+            arguments_str: 已序列化的参数 JSON（可选，提供时不再重复序列化）
 
         Returns:
             执行结果字典
         """
+        if arguments_str is None:
+            arguments_str = json.dumps(arguments, ensure_ascii=False)
+
         # 打印调试信息到 PyMOL 控制台
         print(f"[PyMOL AI Assistant] 执行工具: {tool_name}")
-        print(f"[PyMOL AI Assistant] 参数: {json.dumps(arguments, ensure_ascii=False)}")
+        print(f"[PyMOL AI Assistant] 参数: {arguments_str}")
 
         # 记录到日志
         logger.logger.info(